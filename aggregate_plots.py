@@ -0,0 +1,168 @@
+"""
+聚合优先的绘图工具
+Aggregate-first plotting helpers
+
+所有图形只基于预先计算的聚合结果(分箱计数、分位数摘要、二维计数、配对计数)绘制,
+绘图开销只与分箱/取值的数量有关, 与受访者人数无关。
+"""
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+
+from sketches import weighted_percentile
+
+
+# ============================================================================
+# 聚合
+# ============================================================================
+
+def histogram_counts(values, bins=10, range=None):
+    """分箱计数, 返回 (counts, edges), 与 plt.hist 的分箱规则一致"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    return np.histogram(values, bins=bins, range=range)
+
+
+def value_counts(values):
+    """离散取值聚合, 返回排序后的 (取值, 计数)"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    return np.unique(values, return_counts=True)
+
+
+def pair_counts(x, y):
+    """二维取值聚合, 返回 (x取值, y取值, 计数), 用于代替逐点散点图"""
+    pairs = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+    pairs = pairs[~np.isnan(pairs).any(axis=1)]
+    if len(pairs) == 0:
+        return np.array([]), np.array([]), np.array([], dtype=int)
+    uniq, counts = np.unique(pairs, axis=0, return_counts=True)
+    return uniq[:, 0], uniq[:, 1], counts
+
+
+def box_stats_from_counts(uniq, counts, label=None, whis=1.5):
+    """根据取值计数生成箱线图摘要(Axes.bxp 的输入格式)"""
+    uniq = np.asarray(uniq, dtype=float)
+    counts = np.asarray(counts)
+    order = np.argsort(uniq)
+    uniq, counts = uniq[order], counts[order]
+
+    q1, med, q3 = (weighted_percentile(uniq, counts, q) for q in (25, 50, 75))
+    iqr = q3 - q1
+    # 须线规则与 matplotlib.cbook.boxplot_stats 保持一致
+    inside = uniq[(uniq >= q1 - whis * iqr) & (uniq <= q3 + whis * iqr)]
+    whislo = min(inside.min(), q1) if len(inside) else q1
+    whishi = max(inside.max(), q3) if len(inside) else q3
+
+    return {
+        'label': label,
+        'mean': np.sum(uniq * counts) / np.sum(counts),
+        'med': med,
+        'q1': q1,
+        'q3': q3,
+        'iqr': iqr,
+        'whislo': whislo,
+        'whishi': whishi,
+        # 离群值只保留不同取值, 数量有上限
+        'fliers': uniq[(uniq < whislo) | (uniq > whishi)],
+    }
+
+
+def box_stats(values, label=None, whis=1.5):
+    """对单列数据先聚合再生成箱线图摘要"""
+    uniq, counts = value_counts(values)
+    return box_stats_from_counts(uniq, counts, label=label, whis=whis)
+
+
+def grouped_box_stats(df, group_col, value_col, order=None, whis=1.5):
+    """按分组生成箱线图摘要, 只对 (分组, 取值) 的计数表操作"""
+    counts = df.groupby([group_col, value_col]).size()
+    groups = order if order is not None else sorted(counts.index.get_level_values(0).unique())
+    stats = []
+    for group in groups:
+        if group not in counts.index.get_level_values(0):
+            continue
+        group_counts = counts.xs(group, level=0)
+        stats.append(box_stats_from_counts(group_counts.index.values, group_counts.values,
+                                           label=group, whis=whis))
+    return stats
+
+
+def linear_fit_from_moments(x, y):
+    """用中心化的充分统计量(均值与协矩)拟合一元线性趋势, 返回 (斜率, 截距)
+
+    先减去均值再求平方和, 避免大样本下 n·Σxx - (Σx)² 的相消误差。
+    所有 x 相同时斜率无定义, 返回水平线 (0, ȳ)。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    mask = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[mask], y[mask]
+    if len(x) == 0:
+        raise ValueError("没有可用于拟合趋势线的数据")
+    mean_x, mean_y = x.mean(), y.mean()
+    dx = x - mean_x
+    sxx = np.dot(dx, dx)
+    if sxx == 0:
+        return 0.0, mean_y
+    slope = np.dot(dx, y - mean_y) / sxx
+    return slope, mean_y - slope * mean_x
+
+
+# ============================================================================
+# 绘图
+# ============================================================================
+
+def plot_histogram(counts, edges, ax=None, **kwargs):
+    """用分箱计数绘制直方图"""
+    ax = ax or plt.gca()
+    return ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', **kwargs)
+
+
+def plot_boxplot(stats, ax=None, widths=0.6, patch_artist=True, **kwargs):
+    """用箱线图摘要绘制箱线图"""
+    ax = ax or plt.gca()
+    return ax.bxp(stats, widths=widths, patch_artist=patch_artist, **kwargs)
+
+
+def plot_count_bubbles(x, y, counts, ax=None, max_count=None, min_size=20.0, max_size=400.0,
+                       **kwargs):
+    """二维计数气泡图: 每个 (x, y) 单元格一个点, 面积按人数线性映射到 [min_size, max_size]
+
+    分多次调用(如按类别着色)时传入统一的 max_count, 保证各类别的面积可比。
+    """
+    ax = ax or plt.gca()
+    counts = np.asarray(counts, dtype=float)
+    if max_count is None:
+        max_count = counts.max(initial=1)
+    sizes = min_size + (max_size - min_size) * counts / max(max_count, 1)
+    return ax.scatter(x, y, s=sizes, **kwargs)
+
+
+def uniform_legend_markers(legend, size=60.0):
+    """图例中的气泡统一为同一大小, 不随第一个点的面积变化"""
+    for handle in legend.legend_handles:
+        if hasattr(handle, 'set_sizes'):
+            handle.set_sizes([size])
+    return legend
+
+
+def plot_paired_lines(before, after, ax=None, x=(1, 2), color='gray', alpha=0.3,
+                      max_linewidth=6.0):
+    """配对变化图: 相同 (前, 后) 组合合并为一条线段, 全部线段放入一个 LineCollection"""
+    ax = ax or plt.gca()
+    y0, y1, counts = pair_counts(before, after)
+    segments = np.stack([np.column_stack([np.full(len(y0), x[0]), y0]),
+                         np.column_stack([np.full(len(y1), x[1]), y1])], axis=1)
+    linewidths = 0.5 + (max_linewidth - 0.5) * counts / max(counts.max(initial=1), 1)
+    collection = LineCollection(segments, colors=color, alpha=alpha, linewidths=linewidths)
+    ax.add_collection(collection)
+
+    # 端点: 每个不同取值一个点
+    for xi, ys in zip(x, (y0, y1)):
+        ys = np.unique(ys)
+        ax.plot(np.full(len(ys), xi), ys, 'o', color=color, alpha=alpha, markersize=4)
+    ax.autoscale_view()
+    return collection
@@ -15,6 +15,14 @@ from statsmodels.stats.outliers_influence import variance_inflation_factor
 import warnings
 warnings.filterwarnings('ignore')
 
+from aggregate_plots import (histogram_counts, box_stats, grouped_box_stats, pair_counts,
+                             linear_fit_from_moments, plot_histogram, plot_boxplot,
+                             plot_count_bubbles, plot_paired_lines, uniform_legend_markers)
+from sketches import StreamingSummary
+from dedup import deduplicate
+from export import Exporter
+from simulation import ScenarioSimulator, Shift, Recode
+
 # 设置中文字体和绘图风格
 plt.rcParams['font.sans-serif'] = ['Arial']
 plt.rcParams['axes.unicode_minus'] = False
@@ -168,11 +176,18 @@ data['income_level'] = data['income'].apply(categorize_income)
 # 删除关键变量缺失的样本
 data_clean = data[data['thrift_past_year_num'].notna()].copy()
 
+# 去重: 基于 respondentID + 答案指纹 的哈希索引, 删除完全重复与近似重复的提交
+answer_columns = new_columns[2:]
+data_clean, dedup_report = deduplicate(data_clean, answer_columns, mode='drop')
+print("去重结果:")
+print(dedup_report.to_string())
+
 print(f"清洗后样本量: {data_clean.shape[0]}")
 print()
 
-# 保存清洗后的数据
-data_clean.to_csv("data_cleaned.csv", index=False)
+# 保存清洗后的数据(后台写入, 第8节统一等待完成)
+exporter = Exporter()
+exporter.add_dataframe(data_clean, "data_cleaned.csv")
 
 # ============================================================================
 # 2. 描述性统计分析
@@ -181,11 +196,15 @@ data_clean.to_csv("data_cleaned.csv", index=False)
 print("\n2. 描述性统计分析")
 print("-" * 80)
 
+# 单次遍历、固定内存的描述性统计(分位数来自 KLL 草图, 可跨文件合并)
 print("\n过去一年二手购物频率统计:")
-print(data_clean['thrift_past_year_num'].describe())
+print(StreamingSummary().update(data_clean['thrift_past_year_num']).describe(name='thrift_past_year_num'))
 
 print("\n五年前二手购物频率统计:")
-print(data_clean['thrift_five_years_ago_num'].describe())
+print(StreamingSummary().update(data_clean['thrift_five_years_ago_num']).describe(name='thrift_five_years_ago_num'))
+
+# 单文件运行时直接精确计数; 多文件合并时使用 sketches.summarize_chunks 的 HyperLogLog 估计
+print(f"\n不同受访者数: {data_clean['respondentID'].nunique()}")
 
 print("\n二手购物频率分组:")
 print(data_clean['thrift_frequency_group'].value_counts())
@@ -208,7 +227,8 @@ if not os.path.exists("plots"):
 
 # 图1: 二手购物频率分布
 plt.figure(figsize=(10, 6))
-plt.hist(data_clean['thrift_past_year_num'], bins=15, color='#3498db', alpha=0.8, edgecolor='white')
+freq_counts, freq_edges = histogram_counts(data_clean['thrift_past_year_num'], bins=15)
+plot_histogram(freq_counts, freq_edges, color='#3498db', alpha=0.8, edgecolor='white')
 plt.xlabel('Number of Times Thrifted', fontsize=12)
 plt.ylabel('Count', fontsize=12)
 plt.title('Distribution of Thrifting Frequency in Past Year', fontsize=14, fontweight='bold')
@@ -218,15 +238,10 @@ plt.savefig('plots/01_thrift_frequency_distribution.png', dpi=300, bbox_inches='
 plt.close()
 
 # 图2: 时间变化比较
-comparison_data = pd.DataFrame({
-    'Past Year': data_clean['thrift_past_year_num'].dropna(),
-    'Five Years Ago': data_clean['thrift_five_years_ago_num'].dropna()
-})
-
 plt.figure(figsize=(10, 6))
-box_data = [comparison_data['Five Years Ago'].dropna(), comparison_data['Past Year'].dropna()]
-bp = plt.boxplot(box_data, labels=['Five Years Ago', 'Past Year'],
-                 patch_artist=True, widths=0.6)
+box_data = [box_stats(data_clean['thrift_five_years_ago_num'], label='Five Years Ago'),
+            box_stats(data_clean['thrift_past_year_num'], label='Past Year')]
+bp = plot_boxplot(box_data)
 bp['boxes'][0].set_facecolor('#e74c3c')
 bp['boxes'][1].set_facecolor('#2ecc71')
 for element in ['boxes', 'whiskers', 'fliers', 'means', 'medians', 'caps']:
@@ -410,6 +425,22 @@ vif_data["VIF"] = [variance_inflation_factor(X_no_const.values, i)
 print(vif_data)
 print("\n注: VIF > 10 表示存在严重多重共线性")
 
+# 情景模拟: 基于 model1 的系数协方差抽样, 评估干预对平均购物频率的影响
+print("\n\n=== 情景模拟 (what-if) ===")
+simulator = ScenarioSimulator(model1, n_draws=2000)
+scenarios = {
+    '20% fewer perceive Overpriced': [Recode('price_perception_num', 3, 2, share=0.2)],
+    'Social acceptability +1': [Shift('social_accept_num', 1, lower=1, upper=5)],
+    # condition_rating 中 6 = "Not applicable", 不参与平移
+    'Condition rating +1': [Shift('condition_rating', 1, lower=1, upper=5, exclude=[6])],
+    '10% lose affordability motivation': [Recode('motivated_by_affordability', 1, 0, share=0.1)],
+    'Combined: price + social': [Recode('price_perception_num', 3, 2, share=0.2),
+                                 Shift('social_accept_num', 1, lower=1, upper=5)],
+}
+scenario_results = simulator.evaluate(scenarios)
+print(scenario_results.round(3).to_string())
+print("\n注: delta 为相对当前预测均值的变化(次/年), 区间为 95% 参数不确定性区间")
+
 # 相关性分析
 print("\n\n=== 相关性矩阵 ===")
 cor_vars = data_clean[[
@@ -432,26 +463,26 @@ plt.savefig('plots/05_correlation_heatmap.png', dpi=300, bbox_inches='tight')
 plt.close()
 
 # 散点图: 价格感知 vs 购物频率
+# 二维计数代替逐点散点, 点的面积随人数增大(上限固定)
 plt.figure(figsize=(10, 6))
+price_x, price_y, price_n = pair_counts(data_clean['price_perception_num'],
+                                        data_clean['thrift_past_year_num'])
+price_labels = {1: 'Underpriced', 2: 'Priced Correctly', 3: 'Overpriced'}
 for price_val in [1, 2, 3]:
-    subset = data_clean[data_clean['price_perception_num'] == price_val]
-    price_labels = {1: 'Underpriced', 2: 'Priced Correctly', 3: 'Overpriced'}
-    plt.scatter(subset['price_perception_num'], subset['thrift_past_year_num'],
-               alpha=0.5, s=50, label=price_labels[price_val])
-
-# 添加趋势线
-price_freq_data = data_clean[['price_perception_num', 'thrift_past_year_num']].dropna()
-z = np.polyfit(price_freq_data['price_perception_num'], 
-               price_freq_data['thrift_past_year_num'], 1)
-p = np.poly1d(z)
-x_line = np.linspace(price_freq_data['price_perception_num'].min(), 
-                     price_freq_data['price_perception_num'].max(), 100)
-plt.plot(x_line, p(x_line), "r--", linewidth=2, label='Trend Line')
+    mask = price_x == price_val
+    plot_count_bubbles(price_x[mask], price_y[mask], price_n[mask], max_count=price_n.max(),
+                       alpha=0.5, label=price_labels[price_val])
+
+# 添加趋势线(基于充分统计量)
+slope, intercept = linear_fit_from_moments(data_clean['price_perception_num'],
+                                           data_clean['thrift_past_year_num'])
+x_line = np.linspace(price_x.min(), price_x.max(), 100)
+plt.plot(x_line, slope * x_line + intercept, "r--", linewidth=2, label='Trend Line')
 
 plt.xlabel('Price Perception (1=Underpriced, 2=Correct, 3=Overpriced)', fontsize=12)
 plt.ylabel('Thrifting Frequency (times/year)', fontsize=12)
 plt.title('Price Perception vs. Thrifting Frequency', fontsize=14, fontweight='bold')
-plt.legend()
+uniform_legend_markers(plt.legend())
 plt.grid(alpha=0.3)
 plt.tight_layout()
 plt.savefig('plots/06_price_vs_frequency.png', dpi=300, bbox_inches='tight')
@@ -459,12 +490,8 @@ plt.close()
 
 # 箱线图: 衣物状况 vs 购物频率
 plt.figure(figsize=(10, 6))
-condition_data = data_clean[data_clean['condition_rating'].notna()]
-condition_groups = [condition_data[condition_data['condition_rating'] == i]['thrift_past_year_num'].values 
-                   for i in sorted(condition_data['condition_rating'].unique())]
-bp = plt.boxplot(condition_groups, 
-                labels=sorted(condition_data['condition_rating'].unique()),
-                patch_artist=True, widths=0.6)
+condition_groups = grouped_box_stats(data_clean, 'condition_rating', 'thrift_past_year_num')
+bp = plot_boxplot(condition_groups)
 for patch in bp['boxes']:
     patch.set_facecolor('#2ecc71')
     patch.set_alpha(0.7)
@@ -479,12 +506,8 @@ plt.close()
 
 # 箱线图: 社会接受度 vs 购物频率
 plt.figure(figsize=(10, 6))
-social_data = data_clean[data_clean['social_accept_num'].notna()]
-social_groups = [social_data[social_data['social_accept_num'] == i]['thrift_past_year_num'].values 
-                for i in sorted(social_data['social_accept_num'].unique())]
-bp = plt.boxplot(social_groups,
-                labels=sorted(social_data['social_accept_num'].unique()),
-                patch_artist=True, widths=0.6)
+social_groups = grouped_box_stats(data_clean, 'social_accept_num', 'thrift_past_year_num')
+bp = plot_boxplot(social_groups)
 for patch in bp['boxes']:
     patch.set_facecolor('#9b59b6')
     patch.set_alpha(0.7)
@@ -530,7 +553,7 @@ else:
 # 变化统计
 print("\n=== 变化统计 ===")
 print(f"平均变化: {change_data['thrift_change'].mean():.2f} 次/年")
-print(f"中位数变化: {change_data['thrift_change'].median():.2f} 次/年")
+print(f"中位数变化: {StreamingSummary().update(change_data['thrift_change']).quantile(0.5):.2f} 次/年")
 print(f"标准差: {change_data['thrift_change'].std():.2f}")
 print(f"\n增加的人数: {(change_data['thrift_change'] > 0).sum()} ({(change_data['thrift_change'] > 0).mean()*100:.1f}%)")
 print(f"减少的人数: {(change_data['thrift_change'] < 0).sum()} ({(change_data['thrift_change'] < 0).mean()*100:.1f}%)")
@@ -555,8 +578,8 @@ print(change_data['change_direction'].value_counts())
 
 # 可视化: 变化分布直方图
 plt.figure(figsize=(10, 6))
-plt.hist(change_data['thrift_change'], bins=20, color='#f39c12', 
-         alpha=0.8, edgecolor='white')
+change_counts, change_edges = histogram_counts(change_data['thrift_change'], bins=20)
+plot_histogram(change_counts, change_edges, color='#f39c12', alpha=0.8, edgecolor='white')
 plt.axvline(x=0, color='red', linestyle='--', linewidth=2, label='No Change')
 plt.axvline(x=change_data['thrift_change'].mean(), color='blue', 
             linestyle='--', linewidth=2, label=f'Mean Change ({change_data["thrift_change"].mean():.1f})')
@@ -569,14 +592,9 @@ plt.tight_layout()
 plt.savefig('plots/09_thrift_change_distribution.png', dpi=300, bbox_inches='tight')
 plt.close()
 
-# 成对比较可视化
-sample_size = min(50, len(change_data))
-sample_data = change_data.sample(n=sample_size, random_state=42)
-
+# 成对比较可视化: 相同的 (五年前, 过去一年) 组合合并为一条线, 线宽与人数成正比
 plt.figure(figsize=(10, 6))
-for idx, row in sample_data.iterrows():
-    plt.plot([1, 2], [row['thrift_five_years_ago_num'], row['thrift_past_year_num']], 
-             'o-', color='gray', alpha=0.3, markersize=4)
+plot_paired_lines(change_data['thrift_five_years_ago_num'], change_data['thrift_past_year_num'])
 
 # 平均值线
 avg_five_years = change_data['thrift_five_years_ago_num'].mean()
@@ -586,7 +604,7 @@ plt.plot([1, 2], [avg_five_years, avg_past_year],
 
 plt.xticks([1, 2], ['Five Years Ago', 'Past Year'])
 plt.ylabel('Frequency (times per year)', fontsize=12)
-plt.title(f'Individual Changes in Thrifting Frequency (Sample of {sample_size})', 
+plt.title(f'Individual Changes in Thrifting Frequency (n = {len(change_data)})', 
           fontsize=14, fontweight='bold')
 plt.legend()
 plt.grid(axis='y', alpha=0.3)
@@ -643,14 +661,9 @@ print(income_analysis)
 
 # 可视化
 plt.figure(figsize=(10, 6))
-income_data = data_clean[data_clean['income_level'].notna()]
-income_data['income_level'] = pd.Categorical(income_data['income_level'], 
-                                             categories=income_order, ordered=True)
-income_groups = [income_data[income_data['income_level'] == level]['thrift_past_year_num'].values 
-                for level in income_order if level in income_data['income_level'].values]
-
-bp = plt.boxplot(income_groups, labels=[l for l in income_order if l in income_data['income_level'].values],
-                patch_artist=True, widths=0.6)
+income_groups = grouped_box_stats(data_clean, 'income_level', 'thrift_past_year_num',
+                                  order=income_order)
+bp = plot_boxplot(income_groups)
 colors_income = ['#e74c3c', '#f39c12', '#f1c40f', '#2ecc71']
 for patch, color in zip(bp['boxes'], colors_income):
     patch.set_facecolor(color)
@@ -740,21 +753,24 @@ results_summary = {
 }
 
 # 保存为JSON
-import json
-with open('analysis_results_summary.json', 'w', encoding='utf-8') as f:
-    json.dump(results_summary, f, indent=2, ensure_ascii=False)
+exporter.add_json(results_summary, 'analysis_results_summary.json')
 
 # 保存详细结果
-barriers_by_group.to_csv('results_barriers_by_group.csv')
-change_by_group.to_csv('results_change_by_group.csv')
-income_analysis.to_csv('results_income_analysis.csv')
-intl_analysis.to_csv('results_international_analysis.csv')
-political_analysis.to_csv('results_political_analysis.csv')
+exporter.add_dataframe(barriers_by_group, 'results_barriers_by_group.csv', index=True)
+exporter.add_dataframe(change_by_group, 'results_change_by_group.csv', index=True)
+exporter.add_dataframe(income_analysis, 'results_income_analysis.csv', index=True)
+exporter.add_dataframe(intl_analysis, 'results_international_analysis.csv', index=True)
+exporter.add_dataframe(political_analysis, 'results_political_analysis.csv', index=True)
+
+# 并发写入完成后生成带校验和的 manifest
+exporter.flush()
+exporter.close()
 
 print("\n分析完成！")
 print("- 图表保存在: plots/")
 print("- 清洗后数据: data_cleaned.csv")
 print("- 结果摘要: analysis_results_summary.json")
 print("- 详细结果表格: results_*.csv")
+print("- 导出清单: export_manifest.json")
 print("\n" + "=" * 80)
 
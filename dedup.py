@@ -0,0 +1,156 @@
+"""
+合并导出数据的去重与受访者完整性索引
+Deduplication and respondent-level integrity index
+
+对每一行计算两个 64 位哈希:
+- 答案指纹: 所有答题列的哈希
+- 记录键: respondentID + 答案指纹 的哈希
+
+索引只保存已见过的哈希值, 不保存原始行, 可以按块单次遍历千万级数据。
+精确去重必须记住所有见过的行, 因此内存随不同行数线性增长(O(不同行数)):
+三个索引合计每个不同行约 24 字节, 一千万行约 240 MB。
+
+判定规则(按优先级):
+- exact_duplicate: respondentID 与答案完全相同的重复提交
+- near_duplicate: 答案与之前某份问卷完全相同(ID 不同), 且作答时长极短
+- conflicting_id: respondentID 已出现过但答案不同(只标记, 不删除)
+- unique: 其他
+"""
+
+import numpy as np
+import pandas as pd
+
+
+DUPLICATE_STATUSES = ['unique', 'exact_duplicate', 'near_duplicate', 'conflicting_id']
+DROPPED_STATUSES = ['exact_duplicate', 'near_duplicate']
+
+
+def _hash_columns(df, columns):
+    """按行计算指定列的 64 位哈希(列顺序敏感, 与 DataFrame 索引无关)"""
+    return pd.util.hash_pandas_object(df[columns].astype(str), index=False).values
+
+
+def _combine_hashes(a, b):
+    """组合两个 uint64 哈希数组"""
+    return pd.util.hash_array(a ^ (b * np.uint64(0x9E3779B97F4A7C15)))
+
+
+class _HashIndex:
+    """由若干有序 uint64 段组成的哈希集合
+
+    每块的新键作为一个有序段追加, 相邻段大小接近时合并(类似 LSM 树),
+    段的大小按几何级数递减, 段数为 O(log n), 每个键只被复制 O(log n) 次,
+    避免每块都复制整个索引。
+    """
+
+    def __init__(self):
+        self.runs = []
+
+    def contains(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            pos = np.searchsorted(run, hashes)
+            pos[pos == len(run)] = 0
+            found |= run[pos] == hashes
+        return found
+
+    def add(self, hashes):
+        new = np.unique(hashes[~self.contains(hashes)])
+        if len(new) == 0:
+            return
+        self.runs.append(new)
+        # 各段互不相交, 合并只需一次有序归并
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]), kind='stable')
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+
+def _first_in_chunk(hashes):
+    """块内每个哈希值第一次出现的位置为 True"""
+    return ~pd.Index(hashes).duplicated(keep='first')
+
+
+class Deduplicator:
+    """按块处理的去重器, 索引在块之间共享
+
+    answer_columns: 参与答案指纹的列
+    min_duration_hours: 答案相同且作答时长低于该值时视为近似重复
+    """
+
+    def __init__(self, answer_columns, id_column='respondentID',
+                 duration_column='duration_hours', min_duration_hours=0.05):
+        self.answer_columns = list(answer_columns)
+        self.id_column = id_column
+        self.duration_column = duration_column
+        self.min_duration_hours = min_duration_hours
+        self.seen_records = _HashIndex()
+        self.seen_ids = _HashIndex()
+        self.seen_answers = _HashIndex()
+        self.counts = dict.fromkeys(DUPLICATE_STATUSES, 0)
+
+    def classify(self, chunk):
+        """返回每一行的重复状态(Series, 与 chunk 同索引), 并更新索引"""
+        answer_fp = _hash_columns(chunk, self.answer_columns)
+        id_hash = _hash_columns(chunk, [self.id_column])
+        record_key = _combine_hashes(id_hash, answer_fp)
+
+        # 与历史索引比较, 再处理块内重复
+        exact = self.seen_records.contains(record_key) | ~_first_in_chunk(record_key)
+        id_seen = self.seen_ids.contains(id_hash) | ~_first_in_chunk(id_hash)
+        answers_seen = self.seen_answers.contains(answer_fp) | ~_first_in_chunk(answer_fp)
+        too_fast = (chunk[self.duration_column] < self.min_duration_hours).values
+
+        status = np.full(len(chunk), 'unique', dtype=object)
+        status[id_seen & ~exact] = 'conflicting_id'
+        status[answers_seen & too_fast] = 'near_duplicate'
+        status[exact] = 'exact_duplicate'
+
+        self.seen_records.add(record_key)
+        self.seen_ids.add(id_hash)
+        self.seen_answers.add(answer_fp)
+
+        result = pd.Series(status, index=chunk.index, name='duplicate_status')
+        for name, n in result.value_counts().items():
+            self.counts[name] += int(n)
+        return result
+
+    def process(self, chunk, mode='drop'):
+        """处理一个数据块
+
+        mode='flag': 增加 duplicate_status 列
+        mode='drop': 删除完全重复和近似重复的行
+        """
+        if mode not in ('flag', 'drop'):
+            raise ValueError(f"未知的去重模式: {mode}")
+        status = self.classify(chunk)
+        if mode == 'flag':
+            return chunk.assign(duplicate_status=status)
+        return chunk[~status.isin(DROPPED_STATUSES)]
+
+    def report(self):
+        """各重复状态的计数"""
+        return pd.Series(self.counts, name='n')
+
+
+def deduplicate(df, answer_columns, mode='drop', **kwargs):
+    """对单个 DataFrame 去重, 返回 (结果, 各状态计数)"""
+    deduper = Deduplicator(answer_columns, **kwargs)
+    result = deduper.process(df, mode=mode)
+    return result, deduper.report()
+
+
+def deduplicate_chunks(chunks, answer_columns=None, mode='drop', deduper=None, **kwargs):
+    """对分块数据(如 pd.read_csv(chunksize=...) 或多个导出文件)逐块去重, 生成处理后的块
+
+    传入自己创建的 deduper 时使用它(忽略 answer_columns 和 kwargs),
+    遍历结束后可以调用 deduper.report() 得到各状态计数。
+    """
+    if deduper is None:
+        if answer_columns is None:
+            raise ValueError("需要提供 answer_columns 或 deduper")
+        deduper = Deduplicator(answer_columns, **kwargs)
+    for chunk in chunks:
+        yield deduper.process(chunk, mode=mode)
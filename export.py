@@ -0,0 +1,165 @@
+"""
+异步批量导出
+Asynchronous batched export of result tables, summaries and cleaned data
+
+- 所有输出先进入队列, 由线程池并发写入, 主流程不会被慢速存储阻塞
+- 原子写入: 先写同目录下的临时文件, 计算校验和后再 os.replace 重命名
+- 格式由扩展名决定: .csv / .csv.gz / .parquet / .jsonl / .json
+- flush() 等待全部写入完成并生成 manifest(文件大小、行数、SHA-256),
+  下游只需轮询 manifest 即可知道哪些文件已就绪
+
+注意: 入队的 DataFrame 在写入完成前不应被修改。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+
+MANIFEST_NAME = 'export_manifest.json'
+
+# mkstemp 创建的临时文件权限为 0600, 重命名前改为该权限
+DEFAULT_FILE_MODE = 0o644
+
+
+def _detect_format(path):
+    """根据扩展名判断输出格式"""
+    for suffix, fmt in [('.csv.gz', 'csv.gz'), ('.csv', 'csv'), ('.parquet', 'parquet'),
+                        ('.jsonl', 'jsonl'), ('.json', 'json')]:
+        if path.endswith(suffix):
+            return fmt
+    raise ValueError(f"无法识别的导出格式: {path}")
+
+
+def _sha256(path, block_size=1 << 20):
+    """分块计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_dataframe(df, tmp_path, fmt, index):
+    if fmt == 'csv':
+        df.to_csv(tmp_path, index=index)
+    elif fmt == 'csv.gz':
+        df.to_csv(tmp_path, index=index, compression='gzip')
+    elif fmt == 'parquet':
+        # 需要 pyarrow 或 fastparquet
+        df.to_parquet(tmp_path, index=index)
+    elif fmt == 'jsonl':
+        (df.reset_index() if index else df).to_json(tmp_path, orient='records', lines=True,
+                                                     force_ascii=False)
+    else:
+        raise ValueError(f"DataFrame 不支持导出为 {fmt}")
+
+
+def _write_json(obj, tmp_path, fmt):
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        if fmt == 'json':
+            json.dump(obj, f, indent=2, ensure_ascii=False)
+        elif fmt == 'jsonl':
+            for record in obj:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            raise ValueError(f"JSON 对象不支持导出为 {fmt}")
+
+
+def atomic_write(path, write_func, mode=DEFAULT_FILE_MODE):
+    """原子写入: write_func(临时路径) 写完后校验并重命名为目标文件, 返回 SHA-256"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.',
+                                    suffix='.tmp')
+    os.close(fd)
+    try:
+        write_func(tmp_path)
+        os.chmod(tmp_path, mode)
+        checksum = _sha256(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return checksum
+
+
+class Exporter:
+    """导出队列
+
+    用法:
+        exporter = Exporter(max_workers=4)
+        exporter.add_dataframe(df, 'results.csv.gz')
+        exporter.add_json(summary, 'summary.json')
+        manifest = exporter.flush()
+
+    manifest 是累积的: 多次 flush() 时包含此前所有已完成的文件(同一路径保留最新一次)。
+    """
+
+    def __init__(self, output_dir='.', max_workers=4, manifest_name=MANIFEST_NAME,
+                 file_mode=DEFAULT_FILE_MODE):
+        self.output_dir = output_dir
+        self.manifest_name = manifest_name
+        self.file_mode = file_mode
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.pending = []
+        self.completed = {}
+
+    def _submit(self, path, fmt, rows, write_func):
+        full_path = os.path.join(self.output_dir, path)
+        future = self.pool.submit(atomic_write, full_path, write_func, self.file_mode)
+        self.pending.append((path, fmt, rows, future))
+        return future
+
+    def add_dataframe(self, df, path, index=False):
+        """DataFrame 入队, 立即开始后台写入"""
+        fmt = _detect_format(path)
+        return self._submit(path, fmt, len(df),
+                            lambda tmp_path: _write_dataframe(df, tmp_path, fmt, index))
+
+    def add_json(self, obj, path):
+        """JSON 对象入队(.json 为单个对象, .jsonl 为记录列表)"""
+        fmt = _detect_format(path)
+        rows = len(obj) if fmt == 'jsonl' else None
+        return self._submit(path, fmt, rows, lambda tmp_path: _write_json(obj, tmp_path, fmt))
+
+    def flush(self):
+        """等待队列中的全部写入完成, 原子写入 manifest 并返回其内容
+
+        任一文件写入失败时抛出该异常, 此时不会更新 manifest。
+        """
+        for path, fmt, rows, future in self.pending:
+            checksum = future.result()
+            self.completed[path] = {
+                'path': path,
+                'format': fmt,
+                'rows': rows,
+                'bytes': os.path.getsize(os.path.join(self.output_dir, path)),
+                'sha256': checksum,
+            }
+        self.pending = []
+
+        manifest = {
+            'written_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'files': list(self.completed.values()),
+        }
+        atomic_write(os.path.join(self.output_dir, self.manifest_name),
+                     lambda tmp_path: _write_json(manifest, tmp_path, 'json'), self.file_mode)
+        return manifest
+
+    def close(self):
+        """关闭线程池(不写 manifest)"""
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        self.close()
+        return False
@@ -0,0 +1,168 @@
+"""
+情景模拟: 价格与认知变化下的购物频率预测
+Scenario simulation on the fitted frequency regression
+
+基于已拟合的 OLS 模型(问题2 的 model1), 对自变量施加干预, 重新计算
+thrift_past_year_num 的预测值。参数不确定性来自系数协方差矩阵的多元正态抽样,
+所有抽样一次生成, 之后每个情景只需一次矩阵乘法。
+
+干预:
+- Shift('social_accept_num', 1, lower=1, upper=5): 所有人加一分(截断到量表范围)
+- Shift('condition_rating', 1, upper=5, exclude=[6]): 同上, 但 6 = "Not applicable" 的受访者不变
+- Recode('price_perception_num', 3, 2, share=0.2): 20% 认为"价格过高"的人改为"价格合理"
+
+evaluate() 在每列的取值计数表上计算干预后的均值, 开销与受访者人数无关,
+适合批量评估上千个情景; simulate() 在完整的受访者数据上逐行预测。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class Shift:
+    """将某一列整体平移 delta, 可选截断到 [lower, upper]
+
+    截断只作用于平移方向(delta > 0 时用 upper, delta < 0 时用 lower),
+    已经超出边界的取值保持不变, 不会被反向移动。
+    exclude 中的取值(如 Likert 题的 6 = "Not applicable")不参与平移。
+    """
+
+    def __init__(self, column, delta, lower=None, upper=None, exclude=None):
+        self.column = column
+        self.delta = delta
+        self.lower = lower
+        self.upper = upper
+        self.exclude = list(exclude) if exclude is not None else []
+
+    def _shift(self, values):
+        shifted = values + self.delta
+        if self.delta > 0 and self.upper is not None:
+            shifted = np.minimum(shifted, np.maximum(values, self.upper))
+        elif self.delta < 0 and self.lower is not None:
+            shifted = np.maximum(shifted, np.minimum(values, self.lower))
+        if self.exclude:
+            shifted = np.where(np.isin(values, self.exclude), values, shifted)
+        return shifted
+
+    def apply_counts(self, values, weights):
+        return self._shift(values), weights
+
+    def apply_array(self, column, rng):
+        return self._shift(column)
+
+
+class Recode:
+    """将取值为 from_value 的受访者中 share 比例改为 to_value"""
+
+    def __init__(self, column, from_value, to_value, share=1.0):
+        if not 0 <= share <= 1:
+            raise ValueError("share 必须在 0 到 1 之间")
+        self.column = column
+        self.from_value = from_value
+        self.to_value = to_value
+        self.share = share
+
+    def apply_counts(self, values, weights):
+        # 取值计数表上按期望比例移动权重
+        moved = weights[values == self.from_value].sum() * self.share
+        weights = np.where(values == self.from_value, weights * (1 - self.share), weights)
+        return np.append(values, self.to_value), np.append(weights, moved)
+
+    def apply_array(self, column, rng):
+        column = column.copy()
+        eligible = np.flatnonzero(column == self.from_value)
+        n_changed = int(round(len(eligible) * self.share))
+        column[rng.choice(eligible, size=n_changed, replace=False)] = self.to_value
+        return column
+
+
+class ScenarioSimulator:
+    """基于已拟合 OLS 模型的情景模拟器
+
+    model: statsmodels 回归结果(需有 params / cov_params, 且由 DataFrame 拟合)
+    exog: 用于预测的受访者设计矩阵(含 const 列), 默认使用模型的训练数据
+    n_draws: 系数抽样次数
+    """
+
+    def __init__(self, model, exog=None, n_draws=1000, seed=42):
+        self.columns = list(model.model.exog_names)
+        if exog is None:
+            exog = model.model.data.orig_exog
+        self.exog = exog[self.columns]
+        self.params = np.asarray(model.params)
+        rng = np.random.default_rng(seed)
+        self.draws = rng.multivariate_normal(self.params, np.asarray(model.cov_params()),
+                                             size=n_draws)
+
+        # 每列的取值计数表, evaluate() 只在这些表上操作
+        self.value_counts = {}
+        for col in self.columns:
+            values, counts = np.unique(self.exog[col].to_numpy(dtype=float), return_counts=True)
+            self.value_counts[col] = (values, counts.astype(float))
+        self.baseline_means = self._column_means([])
+
+    def _check(self, interventions):
+        for intervention in interventions:
+            if intervention.column not in self.columns or intervention.column == 'const':
+                raise ValueError(f"模型中没有可干预的变量: {intervention.column}")
+
+    def _column_means(self, interventions):
+        """干预后设计矩阵各列的均值"""
+        tables = dict(self.value_counts)
+        for intervention in interventions:
+            tables[intervention.column] = intervention.apply_counts(*tables[intervention.column])
+        return np.array([np.sum(v * w) / np.sum(w) for v, w in (tables[c] for c in self.columns)])
+
+    def evaluate(self, scenarios, ci=0.95):
+        """批量评估情景对平均购物频率的影响
+
+        scenarios: {情景名: [干预, ...]}
+        返回每个情景一行: 预测均值、相对基线的变化及其置信区间、变化为正的概率
+        """
+        names = list(scenarios)
+        for name in names:
+            self._check(scenarios[name])
+        means = np.vstack([self._column_means(scenarios[name]) for name in names])
+
+        # (情景数, 抽样数) 的预测均值矩阵
+        predicted = means @ self.draws.T
+        delta = (means - self.baseline_means) @ self.draws.T
+        alpha = (1 - ci) / 2
+        return pd.DataFrame({
+            'mean': predicted.mean(axis=1),
+            'delta': delta.mean(axis=1),
+            'delta_ci_low': np.quantile(delta, alpha, axis=1),
+            'delta_ci_high': np.quantile(delta, 1 - alpha, axis=1),
+            'p_increase': (delta > 0).mean(axis=1),
+        }, index=pd.Index(names, name='scenario'))
+
+    def simulate(self, interventions, ci=0.95, seed=42, memory_budget_mb=64, chunk_size=None):
+        """在完整受访者数据上模拟单个情景, 返回每位受访者的预测分布摘要
+
+        baseline 为原始数据在点估计系数下的预测; predicted / ci_low / ci_high 来自系数抽样。
+        seed 决定 Recode 按比例选中的受访者, 相同 seed 的结果可复现。
+        按块计算: 每块的预测矩阵为 chunk_size × n_draws 个 float64, np.quantile 还会再复制一份,
+        默认由 memory_budget_mb 推出 chunk_size, 使这两份合计不超过预算。
+        """
+        if chunk_size is None:
+            chunk_size = max(1, memory_budget_mb * 2 ** 20 // (2 * 8 * len(self.draws)))
+        self._check(interventions)
+        rng = np.random.default_rng(seed)
+        X = self.exog.to_numpy(dtype=float)
+        X_new = X.copy()
+        for intervention in interventions:
+            j = self.columns.index(intervention.column)
+            X_new[:, j] = intervention.apply_array(X_new[:, j], rng)
+
+        alpha = (1 - ci) / 2
+        parts = []
+        for start in range(0, len(X), chunk_size):
+            pred = X_new[start:start + chunk_size] @ self.draws.T
+            parts.append(np.column_stack([
+                X[start:start + chunk_size] @ self.params,
+                pred.mean(axis=1),
+                np.quantile(pred, alpha, axis=1),
+                np.quantile(pred, 1 - alpha, axis=1),
+            ]))
+        return pd.DataFrame(np.vstack(parts), index=self.exog.index,
+                            columns=['baseline', 'predicted', 'ci_low', 'ci_high'])
@@ -0,0 +1,261 @@
+"""
+流式近似统计
+Streaming sketches for descriptive statistics
+
+- KLLSketch: 可合并的分位数草图, 秩误差约为 1.65 / k, 内存 O(k)
+- HyperLogLog: 可合并的基数估计, 相对误差约为 1.04 / sqrt(2^p), 内存 2^p 字节
+- StreamingSummary: 单次遍历、固定内存, 输出与 pandas describe() 相同格式的摘要
+
+所有结构都支持 merge(), 可以分文件/分队列分别统计后再合并。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def weighted_percentile(values, weights, q):
+    """加权百分位数(线性插值), 权重全为 1 时与 np.percentile 完全一致
+
+    values 需已排序; q 取值 0-100。
+    """
+    cum_weights = np.cumsum(weights)
+    pos = q / 100.0 * (cum_weights[-1] - 1)
+    lo, hi = int(np.floor(pos)), int(np.ceil(pos))
+    v_lo = values[min(np.searchsorted(cum_weights, lo, side='right'), len(values) - 1)]
+    v_hi = values[min(np.searchsorted(cum_weights, hi, side='right'), len(values) - 1)]
+    return v_lo + (v_hi - v_lo) * (pos - lo)
+
+
+# ============================================================================
+# 分位数草图 (KLL)
+# ============================================================================
+
+class KLLSketch:
+    """KLL 分位数草图
+
+    k 越大误差越小; 也可以通过 error 指定目标秩误差, 自动换算 k。
+    在数据量不超过容量时不做压缩, 结果是精确值。
+    压缩时的随机选择使用固定默认种子, 同样的输入每次运行得到同样的分位数。
+    """
+
+    def __init__(self, k=200, error=None, seed=42):
+        if error is not None:
+            k = int(np.ceil(1.65 / error))
+        if k < 8:
+            raise ValueError("k 必须不小于 8")
+        self.k = k
+        self.c = 2.0 / 3.0
+        self.compactors = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(np.ceil(self.k * self.c ** depth)) + 1
+
+    def _size(self):
+        return sum(len(c) for c in self.compactors)
+
+    def _max_size(self):
+        return sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compress(self):
+        """逐层压缩: 排序后随机保留奇数位或偶数位元素, 权重翻倍进入上一层"""
+        while self._size() >= self._max_size():
+            for h, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(h):
+                    if h + 1 == len(self.compactors):
+                        self.compactors.append(np.empty(0))
+                    items = np.sort(items)
+                    # 奇数个元素时保留一个在本层
+                    keep = items[-1:] if len(items) % 2 else items[:0]
+                    pairs = items[:len(items) - len(keep)]
+                    offset = self.rng.integers(2)
+                    self.compactors[h + 1] = np.concatenate([self.compactors[h + 1], pairs[offset::2]])
+                    self.compactors[h] = keep
+                    break
+
+    def update(self, values):
+        """批量加入数据(忽略缺失值)"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """合并另一个草图(原地)"""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0))
+        for h, items in enumerate(other.compactors):
+            self.compactors[h] = np.concatenate([self.compactors[h], items])
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        values = np.concatenate(self.compactors)
+        weights = np.concatenate([np.full(len(c), 2 ** h) for h, c in enumerate(self.compactors)])
+        order = np.argsort(values, kind='stable')
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        """近似分位数, q 取值 0-1 (可以是列表)"""
+        values, weights = self._weighted_items()
+        if len(values) == 0:
+            return np.nan if np.isscalar(q) else np.full(len(q), np.nan)
+        if np.isscalar(q):
+            return weighted_percentile(values, weights, q * 100)
+        return np.array([weighted_percentile(values, weights, x * 100) for x in q])
+
+
+# ============================================================================
+# 基数估计 (HyperLogLog)
+# ============================================================================
+
+def _bit_length(x):
+    """uint64 数组逐元素的二进制位数"""
+    x = x.copy()
+    n = np.zeros(x.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = x >= (np.uint64(1) << np.uint64(shift))
+        n[mask] += shift
+        x[mask] >>= np.uint64(shift)
+    return n + (x > 0)
+
+
+def _normalize_ids(values):
+    """ID 统一为字符串: 整数值的浮点数(如含缺失值时读入的 123.0)转为 "123"
+
+    保证同一 ID 在不同文件中无论被解析为 int、float 还是 str 都得到相同的哈希。
+    """
+    values = pd.Series(values).dropna()
+    normalized = values.astype(str)
+    numeric = pd.to_numeric(values, errors='coerce')
+    integral = numeric.notna() & np.isfinite(numeric) & (numeric % 1 == 0)
+    normalized[integral] = numeric[integral].astype(np.int64).astype(str)
+    return normalized.values
+
+
+class HyperLogLog:
+    """HyperLogLog 基数估计, 用于跨文件统计不同受访者数
+
+    p 为寄存器位数(4-18); 也可以通过 error 指定目标相对误差, 自动换算 p。
+    """
+
+    def __init__(self, p=12, error=None):
+        if error is not None:
+            p = int(np.ceil(np.log2((1.04 / error) ** 2)))
+        if not 4 <= p <= 18:
+            raise ValueError("p 必须在 4 到 18 之间")
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, values):
+        """批量加入数据; ID 先规范化为字符串再哈希, 保证不同文件中的同一 ID 哈希一致"""
+        values = _normalize_ids(values)
+        if len(values) == 0:
+            return self
+        hashes = pd.util.hash_array(values.astype(object))
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, idx, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other):
+        """合并另一个估计器(原地), 要求 p 相同"""
+        if other.p != self.p:
+            raise ValueError(f"无法合并不同精度的 HyperLogLog: p={self.p} vs p={other.p}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """估计不同元素个数"""
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        zeros = np.count_nonzero(self.registers == 0)
+        # 小基数时使用线性计数修正
+        if raw <= 2.5 * self.m and zeros > 0:
+            return self.m * np.log(self.m / zeros)
+        return raw
+
+
+# ============================================================================
+# 描述性统计摘要
+# ============================================================================
+
+class StreamingSummary:
+    """单次遍历的描述性统计
+
+    计数、均值、标准差、最小值、最大值为精确值(可合并的矩统计),
+    分位数来自 KLLSketch。
+    """
+
+    def __init__(self, k=200, error=None, seed=42):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = KLLSketch(k=k, error=error, seed=seed)
+
+    def _merge_moments(self, n, mean, m2):
+        total = self.n + n
+        if total == 0:
+            return
+        delta = mean - self.mean
+        self.m2 += m2 + delta ** 2 * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+
+    def update(self, values):
+        """批量加入数据(忽略缺失值)"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        batch_mean = values.mean()
+        self._merge_moments(len(values), batch_mean, np.sum((values - batch_mean) ** 2))
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.sketch.update(values)
+        return self
+
+    def merge(self, other):
+        """合并另一个摘要(原地)"""
+        self._merge_moments(other.n, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def quantile(self, q):
+        """近似分位数, q 取值 0-1"""
+        return self.sketch.quantile(q)
+
+    def describe(self, name=None):
+        """返回与 pandas Series.describe() 相同索引的结果"""
+        if self.n == 0:
+            values = [0.0] + [np.nan] * 7
+        else:
+            std = np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+            q1, med, q3 = self.quantile([0.25, 0.5, 0.75])
+            values = [float(self.n), self.mean, std, self.min, q1, med, q3, self.max]
+        return pd.Series(values, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+                         name=name)
+
+
+def summarize_chunks(chunks, columns, id_column=None, k=200, hll_p=12, seed=42):
+    """对分块数据(如 pd.read_csv(chunksize=...) 或多个队列文件)做单次遍历统计
+
+    返回 (各列 describe() 结果组成的 DataFrame, 不同受访者数估计)。
+    """
+    summaries = {col: StreamingSummary(k=k, seed=seed) for col in columns}
+    distinct = HyperLogLog(p=hll_p)
+    for chunk in chunks:
+        for col in columns:
+            summaries[col].update(chunk[col])
+        if id_column is not None:
+            distinct.update(chunk[id_column])
+    described = pd.DataFrame({col: s.describe() for col, s in summaries.items()})
+    return described, (distinct.estimate() if id_column is not None else None)